@@ -381,6 +381,8 @@ def export_engine(model, im, file, half, dynamic, simplify, workspace=4, verbose
     LOGGER.info(f"{prefix} building FP{16 if builder.platform_has_fast_fp16 and half else 32} engine as {f}")
     if builder.platform_has_fast_fp16 and half:
         config.set_flag(trt.BuilderFlag.FP16)
+    if hasattr(config, "max_aux_streams"):  # TensorRT>=8.6, no auxiliary streams, avoids per-stream scratch memory
+        config.max_aux_streams = 0
     with builder.build_engine(network, config) as engine, open(f, "wb") as t:
         t.write(engine.serialize())
     return f, None
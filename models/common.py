@@ -3,9 +3,11 @@
 
 import ast
 import contextlib
+import functools
 import json
 import math
 import platform
+import threading
 import warnings
 import wave
 import zipfile
@@ -20,6 +22,7 @@ import pandas as pd
 import requests
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 from PIL import Image
 from torch.cuda import amp
 from torch.nn import init
@@ -58,7 +61,10 @@ from utils.general import (
     xyxy2xywh,
     yaml_load,
 )
-from utils.torch_utils import copy_attr, smart_inference_mode
+from utils.torch_utils import copy_attr, fuse_conv_and_bn, smart_inference_mode
+
+if torch.__version__.startswith("1.9."):  # silence torch 1.9 max_pool2d() warning once, not per SPP/SPPF forward
+    warnings.filterwarnings("ignore", message="Named tensors", category=UserWarning)
 
 
 def autopad(k, p=None, d=1):
@@ -67,6 +73,8 @@ def autopad(k, p=None, d=1):
 
     `k`: kernel, `p`: padding, `d`: dilation.
     """
+    if d == 1 and isinstance(k, int):  # fast path, undilated int kernel (nearly every Conv)
+        return k // 2 if p is None else p
     if d > 1:
         k = d * (k - 1) + 1 if isinstance(k, int) else [d * (x - 1) + 1 for x in k]  # actual kernel-size
     if p is None:
@@ -93,6 +101,14 @@ class Conv(nn.Module):
         """Applies a fused convolution and activation function to the input tensor `x`."""
         return self.act(self.conv(x))
 
+    def fuse(self):
+        """Folds BatchNorm2d into the Conv2d weights and bias, then switches to `forward_fuse()` for inference."""
+        if hasattr(self, "bn"):
+            self.conv = fuse_conv_and_bn(self.conv, self.bn)  # update conv
+            delattr(self, "bn")  # remove batchnorm
+            self.forward = self.forward_fuse  # update forward
+        return self
+
 
 class DWConv(Conv):
     # Depth-wise convolution
@@ -134,6 +150,34 @@ class TransformerLayer(nn.Module):
         x = self.fc2(self.fc1(x)) + x
         return x
 
+    def forward_fuse(self, x):
+        """Performs forward pass with one packed q/k/v projection and F.scaled_dot_product_attention(), see `fuse()`."""
+        n, b, c = x.shape  # sequence, batch, channels
+        q, k, v = self.qkv(x).view(n, b, 3, self.ma.num_heads, -1).permute(2, 1, 3, 0, 4).unbind(0)  # (b,heads,n,c_)
+        x = self.ma.out_proj(F.scaled_dot_product_attention(q, k, v).permute(2, 0, 1, 3).reshape(n, b, c)) + x
+        x = self.fc2(self.fc1(x)) + x
+        return x
+
+    def fuse(self):
+        """Composes q/k/v with the MultiheadAttention in-projection into one Linear(c, 3c) and switches to
+        `forward_fuse()` for inference, requires torch>=2.0 scaled_dot_product_attention().
+        """
+        if hasattr(F, "scaled_dot_product_attention") and hasattr(self, "q"):
+            ma = self.ma
+            qkv = nn.Linear(ma.embed_dim, 3 * ma.embed_dim).requires_grad_(False).to(ma.in_proj_weight.device)
+            with torch.no_grad():
+                w = ma.in_proj_weight.chunk(3)  # q, k, v in-projections
+                qkv.weight.copy_(torch.cat([wi @ m.weight for wi, m in zip(w, (self.q, self.k, self.v))]))
+                if ma.in_proj_bias is None:
+                    qkv.bias.zero_()
+                else:
+                    qkv.bias.copy_(ma.in_proj_bias)
+            self.qkv = qkv
+            for k in "q", "k", "v":
+                delattr(self, k)  # remove q, k, v linear layers
+            self.forward = self.forward_fuse  # update forward
+        return self
+
 
 class TransformerBlock(nn.Module):
     # Vision Transformer https://arxiv.org/abs/2010.11929
@@ -159,6 +203,21 @@ class TransformerBlock(nn.Module):
         p = x.flatten(2).permute(2, 0, 1)
         return self.tr(p + self.linear(p)).permute(1, 2, 0).reshape(b, self.c2, w, h)
 
+    def forward_fuse(self, x):
+        """Processes input like `forward()` with the position embedding residual folded into `linear`, see `fuse()`."""
+        if self.conv is not None:
+            x = self.conv(x)
+        b, _, w, h = x.shape
+        return self.tr(self.linear(x.flatten(2).permute(2, 0, 1))).permute(1, 2, 0).reshape(b, self.c2, w, h)
+
+    def fuse(self):
+        """Folds the `p + linear(p)` residual into the linear weights (W + I) and switches to `forward_fuse()`."""
+        if self.forward != self.forward_fuse:
+            with torch.no_grad():
+                self.linear.weight += torch.eye(self.c2, device=self.linear.weight.device, dtype=self.linear.weight.dtype)
+            self.forward = self.forward_fuse  # update forward
+        return self
+
 
 class Bottleneck(nn.Module):
     # Standard bottleneck
@@ -178,6 +237,16 @@ class Bottleneck(nn.Module):
         """
         return x + self.cv2(self.cv1(x)) if self.add else self.cv2(self.cv1(x))
 
+    def forward_fuse(self, x):
+        """Processes input like `forward()`, adding the shortcut in-place into the cv2 output, see `fuse()`."""
+        return self.cv2(self.cv1(x)).add_(x)
+
+    def fuse(self):
+        """Switches shortcut bottlenecks to `forward_fuse()` for inference, reusing the cv2 output for the residual."""
+        if self.add:
+            self.forward = self.forward_fuse  # update forward
+        return self
+
 
 class BottleneckCSP(nn.Module):
     # CSP Bottleneck https://github.com/WongKinYiu/CrossStagePartialNetworks
@@ -203,6 +272,25 @@ class BottleneckCSP(nn.Module):
         y2 = self.cv2(x)
         return self.cv4(self.act(self.bn(torch.cat((y1, y2), 1))))
 
+    def forward_fuse(self, x):
+        """Performs forward pass with the concat BatchNorm2d folded into `cv3` and `cv2`, see `fuse()`."""
+        return self.cv4(self.act(torch.cat((self.cv3(self.m(self.cv1(x))), self.cv2(x)), 1)))
+
+    def fuse(self):
+        """Folds the BatchNorm2d applied to cat(cv3, cv2) into each conv's output-channel slice and switches to
+        `forward_fuse()` for inference.
+        """
+        if hasattr(self, "bn"):
+            c_ = self.cv3.out_channels
+            for k, i in ("cv3", slice(0, c_)), ("cv2", slice(c_, 2 * c_)):  # cat order
+                bn = nn.BatchNorm2d(c_, eps=self.bn.eps).to(self.bn.weight.device)
+                bn.weight.data, bn.bias.data = self.bn.weight.data[i], self.bn.bias.data[i]
+                bn.running_mean, bn.running_var = self.bn.running_mean[i], self.bn.running_var[i]
+                setattr(self, k, fuse_conv_and_bn(getattr(self, k), bn))
+            delattr(self, "bn")  # remove batchnorm
+            self.forward = self.forward_fuse  # update forward
+        return self
+
 
 class CrossConv(nn.Module):
     # Cross Convolution Downsample
@@ -223,6 +311,16 @@ class CrossConv(nn.Module):
         """Performs feature sampling, expanding, and applies shortcut if channels match; expects `x` input tensor."""
         return x + self.cv2(self.cv1(x)) if self.add else self.cv2(self.cv1(x))
 
+    def forward_fuse(self, x):
+        """Performs feature sampling like `forward()`, adding the shortcut in-place into the cv2 output."""
+        return self.cv2(self.cv1(x)).add_(x)
+
+    def fuse(self):
+        """Switches shortcut CrossConvs to `forward_fuse()` for inference, reusing the cv2 output for the residual."""
+        if self.add:
+            self.forward = self.forward_fuse  # update forward
+        return self
+
 
 class C3(nn.Module):
     # CSP Bottleneck with 3 convolutions
@@ -299,9 +397,13 @@ class SPP(nn.Module):
         tensor.
         """
         x = self.cv1(x)
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")  # suppress torch 1.9.0 max_pool2d() warning
-            return self.cv2(torch.cat([x] + [m(x) for m in self.m], 1))
+        y, k0 = [x], 1
+        for m in self.m:
+            k = m.kernel_size
+            # ascending odd kernels chain like SPPF: maxpool(k) == maxpool(k - k0 + 1) of maxpool(k0)
+            y.append(F.max_pool2d(y[-1], k - k0 + 1, 1, (k - k0) // 2) if k > k0 and k % 2 else m(x))
+            k0 = k
+        return self.cv2(torch.cat(y, 1))
 
 
 class SPPF(nn.Module):
@@ -322,11 +424,9 @@ class SPPF(nn.Module):
     def forward(self, x):
         """Processes input through a series of convolutions and max pooling operations for feature extraction."""
         x = self.cv1(x)
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")  # suppress torch 1.9.0 max_pool2d() warning
-            y1 = self.m(x)
-            y2 = self.m(y1)
-            return self.cv2(torch.cat((x, y1, y2, self.m(y2)), 1))
+        y1 = self.m(x)
+        y2 = self.m(y1)
+        return self.cv2(torch.cat((x, y1, y2, self.m(y2)), 1))
 
 
 class Focus(nn.Module):
@@ -344,6 +444,23 @@ class Focus(nn.Module):
         return self.conv(torch.cat((x[..., ::2, ::2], x[..., 1::2, ::2], x[..., ::2, 1::2], x[..., 1::2, 1::2]), 1))
         # return self.conv(self.contract(x))
 
+    def forward_fuse(self, x):
+        """Processes input with a single pixel_unshuffle() space-to-depth op, requires `fuse()` weight permutation."""
+        return self.conv(F.pixel_unshuffle(x, 2))
+
+    def fuse(self):
+        """Permutes conv input channels from slice-concat order (dy + 2 * dx, c) to pixel_unshuffle() order (c, dy, dx)
+        and switches to `forward_fuse()` for inference.
+        """
+        conv = self.conv.conv
+        if conv.groups == 1 and self.forward != self.forward_fuse:
+            c = conv.in_channels // 4
+            i = (torch.tensor([0, 2, 1, 3]) * c).repeat(c) + torch.arange(c).repeat_interleave(4)  # source channels
+            with torch.no_grad():
+                conv.weight.copy_(conv.weight[:, i.to(conv.weight.device)])
+            self.forward = self.forward_fuse  # update forward
+        return self
+
 
 class GhostConv(nn.Module):
     # Ghost Convolution https://github.com/huawei-noah/ghostnet
@@ -397,6 +514,8 @@ class Contract(nn.Module):
         """
         b, c, h, w = x.size()  # assert (h / s == 0) and (W / s == 0), 'Indivisible gain'
         s = self.gain
+        if c == 1:  # (s, s, c) and pixel_unshuffle() (c, s, s) channel orders coincide
+            return F.pixel_unshuffle(x, s)
         x = x.view(b, c, h // s, s, w // s, s)  # x(1,64,40,2,40,2)
         x = x.permute(0, 3, 5, 1, 2, 4).contiguous()  # x(1,2,2,64,40,40)
         return x.view(b, c * s * s, h // s, w // s)  # x(1,256,40,40)
@@ -420,6 +539,8 @@ class Expand(nn.Module):
         """
         b, c, h, w = x.size()  # assert C / s ** 2 == 0, 'Indivisible gain'
         s = self.gain
+        if c == s**2:  # (s, s, c) and pixel_shuffle() (c, s, s) channel orders coincide
+            return F.pixel_shuffle(x, s)
         x = x.view(b, s, s, c // s**2, h, w)  # x(1,2,2,16,80,80)
         x = x.permute(0, 3, 4, 1, 5, 2).contiguous()  # x(1,16,80,2,80,2)
         return x.view(b, c // s**2, h * s, w * s)  # x(1,16,160,160)
@@ -447,8 +568,26 @@ class Concat(nn.Module):
 
 class DetectMultiBackend(nn.Module):
     # YOLOv5 MultiBackend class for python inference on various backends
-    def __init__(self, weights="yolov5s.pt", device=torch.device("cpu"), dnn=False, data=None, fp16=False, fuse=True):
-        """Initializes DetectMultiBackend with support for various inference backends, including PyTorch and ONNX."""
+    def __init__(
+        self,
+        weights="yolov5s.pt",
+        device=torch.device("cpu"),
+        dnn=False,
+        data=None,
+        fp16=False,
+        fuse=True,
+        jit_opt=False,
+        int8=False,
+        cuda_graph=False,
+        torch_compile=False,
+    ):
+        """Initializes DetectMultiBackend with support for various inference backends, including PyTorch and ONNX.
+
+        `jit_opt` traces, freezes and optimizes the PyTorch model with TorchScript for the `warmup()` input shape.
+        `int8` applies dynamic INT8 quantization to the Linear layers of a CPU PyTorch model (convolutions stay FP32).
+        `cuda_graph` captures a CUDA PyTorch/TorchScript forward pass at `warmup()` and replays it for that input shape.
+        `torch_compile` compiles the PyTorch model into one graph with torch.compile (torch>=2.0) at `warmup()`.
+        """
         #   PyTorch:              weights = *.pt
         #   TorchScript:                    *.torchscript
         #   ONNX Runtime:                   *.onnx
@@ -467,10 +606,17 @@ class DetectMultiBackend(nn.Module):
         w = str(weights[0] if isinstance(weights, list) else weights)
         pt, jit, onnx, xml, engine, coreml, saved_model, pb, tflite, edgetpu, tfjs, paddle, triton = self._model_type(w)
         fp16 &= pt or jit or onnx or engine or triton  # FP16
+        jit_opt &= pt  # TorchScript inference optimization
+        torch_compile &= pt and not jit_opt and hasattr(torch, "compile")  # TorchInductor, exclusive with jit_opt
+        int8 &= pt and not fp16 and device.type == "cpu"  # dynamic INT8 quantization, CPU only
         nhwc = coreml or saved_model or pb or tflite or edgetpu  # BHWC formats (vs torch BCWH)
         stride = 32  # default stride
         cuda = torch.cuda.is_available() and device.type != "cpu"  # use CUDA
-        if not (pt or triton):
+        if cuda and (pt or jit):
+            torch.backends.cudnn.benchmark = True  # autotune conv algorithms, inference shapes are fixed
+        cuda_graph &= cuda and (pt or jit)  # CUDA Graph replay
+        graph, graph_io = None, None  # captured in warmup() if cuda_graph
+        if not (pt or triton or Path(w).exists()):
             w = attempt_download(w)  # download if not local
 
         if pt:  # PyTorch
@@ -478,7 +624,14 @@ class DetectMultiBackend(nn.Module):
             stride = max(int(model.stride.max()), 32)  # model stride
             names = model.module.names if hasattr(model, "module") else model.names  # get class names
             model.half() if fp16 else model.float()
+            if int8 and not any(isinstance(m, nn.Linear) for m in model.modules()):
+                LOGGER.warning("WARNING ⚠️ int8 quantizes Linear layers only and this model has none, using FP32")
+                int8 = False
+            if int8:  # INT8 weights and activations for Linear layers (Transformer/Classify), quantized per-forward
+                model = torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
             self.model = model  # explicitly assign for to(), cpu(), cuda(), half()
+            model_jit = None  # optimized TorchScript or torch.compile model, built in warmup() if jit_opt/torch_compile
+            jit_shape = None  # input shape model_jit was traced at (jit_opt), None for any shape
         elif jit:  # TorchScript
             LOGGER.info(f"Loading {w} for TorchScript inference...")
             extra_files = {"config.txt": ""}  # model metadata
@@ -502,6 +655,19 @@ class DetectMultiBackend(nn.Module):
             providers = ["CUDAExecutionProvider", "CPUExecutionProvider"] if cuda else ["CPUExecutionProvider"]
             session = onnxruntime.InferenceSession(w, providers=providers)
             output_names = [x.name for x in session.get_outputs()]
+            io_binding, onnx_outputs = None, None  # CUDA IOBinding, keeps inputs and outputs on device
+            if "CUDAExecutionProvider" in session.get_providers():
+                io_binding, device_id = session.io_binding(), device.index or 0
+                if all(isinstance(d, int) for x in session.get_outputs() for d in x.shape):  # static, preallocate
+                    onnx_outputs = []
+                    for x in session.get_outputs():
+                        dtype = np.float16 if x.type == "tensor(float16)" else np.float32
+                        y = torch.from_numpy(np.empty(x.shape, dtype=dtype)).to(device)
+                        io_binding.bind_output(x.name, "cuda", device_id, dtype, x.shape, y.data_ptr())
+                        onnx_outputs.append(y)
+                else:  # dynamic, onnxruntime allocates on device
+                    for name in output_names:
+                        io_binding.bind_output(name, "cuda", device_id)
             meta = session.get_modelmeta().custom_metadata_map  # metadata
             if "stride" in meta:
                 stride, names = int(meta["stride"]), eval(meta["names"])
@@ -552,7 +718,11 @@ class DetectMultiBackend(nn.Module):
                 im = torch.from_numpy(np.empty(shape, dtype=dtype)).to(device)
                 bindings[name] = Binding(name, dtype, shape, im, int(im.data_ptr()))
             binding_addrs = OrderedDict((n, d.ptr) for n, d in bindings.items())
+            if hasattr(context, "execute_async_v3"):  # TensorRT>=8.5 tensor address API, addresses are set once
+                for name, d in bindings.items():
+                    context.set_tensor_address(name, d.ptr)
             batch_size = bindings["images"].shape[0]  # if dynamic, this is instead max batch size
+            trt_outputs = [bindings[x].data for x in sorted(output_names)]  # persistent, resized in-place if dynamic
         elif coreml:  # CoreML
             LOGGER.info(f"Loading {w} for CoreML inference...")
             import coremltools as ct
@@ -630,6 +800,7 @@ class DetectMultiBackend(nn.Module):
             predictor = pdi.create_predictor(config)
             input_handle = predictor.get_input_handle(predictor.get_input_names()[0])
             output_names = predictor.get_output_names()
+            output_handles = [predictor.get_output_handle(x) for x in output_names]
         elif triton:  # NVIDIA Triton Inference Server
             LOGGER.info(f"Using {w} as Triton Inference Server...")
             check_requirements("tritonclient[all]")
@@ -639,6 +810,8 @@ class DetectMultiBackend(nn.Module):
             nhwc = model.runtime.startswith("tensorflow")
         else:
             raise NotImplementedError(f"ERROR: {w} is not a supported format")
+        if cuda and (pt or jit):
+            model.to(memory_format=torch.channels_last)  # NHWC weights for cuDNN Tensor Core convs
 
         # class names
         if "names" not in locals():
@@ -653,11 +826,25 @@ class DetectMultiBackend(nn.Module):
         b, ch, h, w = im.shape  # batch, channel, height, width
         if self.fp16 and im.dtype != torch.float16:
             im = im.half()  # to FP16
+        if self.cuda and (self.pt or self.jit):
+            im = im.contiguous(memory_format=torch.channels_last)  # match channels_last model
+        if self.graph is not None and im.shape == self.graph_io[0].shape and not (augment or visualize):
+            self.graph_io[0].copy_(im)  # static input
+            self.graph.replay()
+            y = self.graph_io[1]  # static outputs, cloned as the next replay overwrites them
+            if isinstance(y, torch.Tensor):
+                return y.clone()
+            return [x.clone() if isinstance(x, torch.Tensor) else [xi.clone() for xi in x] for x in y]
         if self.nhwc:
-            im = im.permute(0, 2, 3, 1)  # torch BCHW to numpy BHWC shape(1,320,192,3)
+            im = im.permute(0, 2, 3, 1)  # torch BCHW to numpy BHWC shape(1,320,192,3), no copy if BHWC in memory
 
         if self.pt:  # PyTorch
-            y = self.model(im, augment=augment, visualize=visualize) if augment or visualize else self.model(im)
+            if augment or visualize:
+                y = self.model(im, augment=augment, visualize=visualize)
+            elif self.model_jit is not None and self.jit_shape in (None, im.shape):
+                y = self.model_jit(im)
+            else:  # eager, also for other shapes than the traced jit_opt one (e.g. rect inference)
+                y = self.model(im)
         elif self.jit:  # TorchScript
             y = self.model(im)
         elif self.dnn:  # ONNX OpenCV DNN
@@ -665,8 +852,25 @@ class DetectMultiBackend(nn.Module):
             self.net.setInput(im)
             y = self.net.forward()
         elif self.onnx:  # ONNX Runtime
-            im = im.cpu().numpy()  # torch to numpy
-            y = self.session.run(self.output_names, {self.session.get_inputs()[0].name: im})
+            if self.io_binding is None:
+                im = im.cpu().numpy()  # torch to numpy
+                y = self.session.run(self.output_names, {self.session.get_inputs()[0].name: im})
+            else:  # bind the CUDA tensor directly, no host roundtrip
+                im = im.contiguous().to(self.device)  # dense CUDA tensor on the session's device, bound by pointer
+                dtype = np.float16 if im.dtype == torch.float16 else np.float32
+                self.io_binding.bind_input(
+                    self.session.get_inputs()[0].name, "cuda", self.device_id, dtype, tuple(im.shape), im.data_ptr()
+                )
+                torch.cuda.current_stream(im.device).synchronize()  # onnxruntime runs on its own CUDA stream
+                self.session.run_with_iobinding(self.io_binding)
+                if self.onnx_outputs is not None:  # bound buffers are overwritten by the next call, return copies
+                    y = [x.clone() for x in self.onnx_outputs]
+                else:  # device OrtValues allocated by onnxruntime, fresh each run
+                    y = self.io_binding.get_outputs()
+                    if hasattr(y[0]._ortvalue, "to_dlpack"):  # zero-copy view on device
+                        y = [torch.utils.dlpack.from_dlpack(x._ortvalue.to_dlpack()) for x in y]
+                    else:  # onnxruntime built without DLPack, copy to host
+                        y = [x.numpy() for x in y]
         elif self.xml:  # OpenVINO
             im = im.cpu().numpy()  # FP32
             y = list(self.ov_compiled_model(im).values())
@@ -675,14 +879,18 @@ class DetectMultiBackend(nn.Module):
                 i = self.model.get_binding_index("images")
                 self.context.set_binding_shape(i, im.shape)  # reshape if dynamic
                 self.bindings["images"] = self.bindings["images"]._replace(shape=im.shape)
+                self.bindings["images"].data.resize_(tuple(im.shape))  # within max profile size, address unchanged
                 for name in self.output_names:
                     i = self.model.get_binding_index(name)
                     self.bindings[name].data.resize_(tuple(self.context.get_binding_shape(i)))
             s = self.bindings["images"].shape
             assert im.shape == s, f"input size {im.shape} {'>' if self.dynamic else 'not equal to'} max model size {s}"
-            self.binding_addrs["images"] = int(im.data_ptr())
-            self.context.execute_v2(list(self.binding_addrs.values()))
-            y = [self.bindings[x].data for x in sorted(self.output_names)]
+            self.bindings["images"].data.copy_(im)  # write into the persistent input binding, addresses stay fixed
+            if hasattr(self.context, "execute_async_v3"):  # enqueue on the torch stream, ordered without a host sync
+                self.context.execute_async_v3(torch.cuda.current_stream(self.device).cuda_stream)
+            else:
+                self.context.execute_v2(list(self.binding_addrs.values()))
+            y = self.trt_outputs
         elif self.coreml:  # CoreML
             im = im.cpu().numpy()
             im = Image.fromarray((im[0] * 255).astype("uint8"))
@@ -698,7 +906,7 @@ class DetectMultiBackend(nn.Module):
             im = im.cpu().numpy().astype(np.float32)
             self.input_handle.copy_from_cpu(im)
             self.predictor.run()
-            y = [self.predictor.get_output_handle(x).copy_to_cpu() for x in self.output_names]
+            y = [x.copy_to_cpu() for x in self.output_handles]
         elif self.triton:  # NVIDIA Triton Inference Server
             y = self.model(im)
         else:  # TensorFlow (SavedModel, GraphDef, Lite, Edge TPU)
@@ -712,7 +920,9 @@ class DetectMultiBackend(nn.Module):
                 int8 = input["dtype"] == np.uint8  # is TFLite quantized uint8 model
                 if int8:
                     scale, zero_point = input["quantization"]
-                    im = (im / scale + zero_point).astype(np.uint8)  # de-scale
+                    im = im / scale  # de-scale, one float temporary updated in-place
+                    im += zero_point
+                    im = im.astype(np.uint8)
                 self.interpreter.set_tensor(input["index"], im)
                 self.interpreter.invoke()
                 y = []
@@ -720,7 +930,9 @@ class DetectMultiBackend(nn.Module):
                     x = self.interpreter.get_tensor(output["index"])
                     if int8:
                         scale, zero_point = output["quantization"]
-                        x = (x.astype(np.float32) - zero_point) * scale  # re-scale
+                        x = x.astype(np.float32)  # re-scale in-place on a single float32 copy
+                        x -= zero_point
+                        x *= scale
                     y.append(x)
             y = [x if isinstance(x, np.ndarray) else x.numpy() for x in y]
             y[0][..., :4] *= [w, h, w, h]  # xywh normalized to pixels
@@ -738,29 +950,77 @@ class DetectMultiBackend(nn.Module):
         """Performs a single inference warmup to initialize model weights, accepting an `imgsz` tuple for image size."""
         warmup_types = self.pt, self.jit, self.onnx, self.engine, self.saved_model, self.pb, self.triton
         if any(warmup_types) and (self.device.type != "cpu" or self.triton):
-            im = torch.empty(*imgsz, dtype=torch.half if self.fp16 else torch.float, device=self.device)  # input
-            for _ in range(2 if self.jit else 1):  #
-                self.forward(im)  # warmup
+            shapes = [imgsz]
+            if self.engine and self.dynamic:  # prime the max profile batch first, then leave the engine at imgsz
+                shapes.insert(0, (self.batch_size, *imgsz[1:]))
+            for shape in shapes:
+                im = torch.empty(*shape, dtype=torch.half if self.fp16 else torch.float, device=self.device)  # input
+                for _ in range(2 if self.jit else 1):  #
+                    self.forward(im)  # warmup
+        if self.jit_opt and self.model_jit is None:  # trace, freeze (Conv+BN folding, weight prepacking) and optimize
+            im = torch.zeros(*imgsz, dtype=torch.half if self.fp16 else torch.float, device=self.device)  # input
+            try:
+                self.model(im)  # build the Detect() grids eagerly, they are created lazily on the first call
+                self.model_jit = torch.jit.optimize_for_inference(torch.jit.trace(self.model.eval(), im, strict=False))
+                self.model_jit(im)  # warmup
+                self.jit_shape = im.shape  # traced shapes are fixed, forward() runs others eagerly
+            except Exception as e:
+                LOGGER.warning(f"WARNING ⚠️ TorchScript optimization failed, using PyTorch model: {e}")
+        if self.torch_compile and self.model_jit is None:  # TorchInductor, shares self.model's parameters
+            im = torch.zeros(*imgsz, dtype=torch.half if self.fp16 else torch.float, device=self.device)  # input
+            try:
+                self.model(im)  # build the Detect() grids eagerly so the compiled graph does not mutate them
+                model_jit = torch.compile(self.model, dynamic=False, fullgraph=True)  # graph breaks raise
+                model_jit(im)  # compile
+                self.model_jit = model_jit
+            except Exception as e:
+                LOGGER.warning(f"WARNING ⚠️ torch.compile failed, using PyTorch model: {e}")
+        if self.cuda_graph and self.graph is None:  # capture one static-shape forward pass as a CUDA Graph
+            im = torch.zeros(*imgsz, dtype=torch.half if self.fp16 else torch.float, device=self.device)  # input
+            im = im.contiguous(memory_format=torch.channels_last)
+            try:
+                with torch.no_grad():
+                    s = torch.cuda.Stream(self.device)  # side stream warmup, required before capture
+                    s.wait_stream(torch.cuda.current_stream(self.device))
+                    with torch.cuda.stream(s):
+                        for _ in range(3):
+                            self.forward(im)
+                    torch.cuda.current_stream(self.device).wait_stream(s)
+                    graph = torch.cuda.CUDAGraph()
+                    with torch.cuda.graph(graph):
+                        y = self.forward(im)
+                self.graph, self.graph_io = graph, (im, y)
+            except Exception as e:
+                LOGGER.warning(f"WARNING ⚠️ CUDA Graph capture failed, using eager inference: {e}")
 
     @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _export_suffixes():
+        """Returns the export format suffixes as a tuple, built once from `export_formats()`."""
+        from export import export_formats
+
+        return tuple(export_formats().Suffix)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
     def _model_type(p="path/to/model.pt"):
         """
-        Determines model type from file path or URL, supporting various export formats.
+        Determines model type from file path or URL, supporting various export formats, results are memoized per path.
 
         Example: path='path/to/model.onnx' -> type=onnx
         """
         # types = [pt, jit, onnx, xml, engine, coreml, saved_model, pb, tflite, edgetpu, tfjs, paddle]
-        from export import export_formats
         from utils.downloads import is_url
 
-        sf = list(export_formats().Suffix)  # export suffixes
+        sf = DetectMultiBackend._export_suffixes()  # export suffixes
         if not is_url(p, check=False):
             check_suffix(p, sf)  # checks
         url = urlparse(p)  # if url may be Triton inference server
-        types = [s in Path(p).name for s in sf]
+        name = Path(p).name
+        types = [s in name for s in sf]
         types[8] &= not types[9]  # tflite &= not edgetpu
         triton = not any(types) and all([any(s in url.scheme for s in ["http", "grpc"]), url.netloc])
-        return types + [triton]
+        return tuple(types + [triton])  # immutable, shared by lru_cache
 
     @staticmethod
     def _load_metadata(f=Path("path/to/meta.yaml")):
@@ -780,6 +1040,7 @@ class AutoShape(nn.Module):
     classes = None  # (optional list) filter by class, i.e. = [0, 15, 16] for COCO persons, cats and dogs
     max_det = 1000  # maximum number of detections per image
     amp = False  # Automatic Mixed Precision (AMP) inference
+    gpu_letterbox = False  # letterbox on the CUDA inference device with F.interpolate() instead of cv2 on the CPU
 
     def __init__(self, model, verbose=True):
         """Initializes YOLOv5 model for inference, setting up attributes and preparing model for evaluation."""
@@ -789,6 +1050,7 @@ class AutoShape(nn.Module):
         copy_attr(self, model, include=("yaml", "nc", "hyp", "names", "stride", "abc"), exclude=())  # copy attributes
         self.dmb = isinstance(model, DetectMultiBackend)  # DetectMultiBackend() instance
         self.pt = not self.dmb or model.pt  # PyTorch model
+        self.bhwc = self.dmb and (model.nhwc or (model.cuda and (model.pt or model.jit)))  # NHWC or channels_last input
         self.model = model.eval()
         if self.pt:
             m = self.model.model.model[-1] if self.dmb else self.model.model[-1]  # Detect()
@@ -856,9 +1118,14 @@ class AutoShape(nn.Module):
                 shape1.append([int(y * g) for y in s])
                 ims[i] = im if im.data.contiguous else np.ascontiguousarray(im)  # update
             shape1 = [make_divisible(x, self.stride) for x in np.array(shape1).max(0)]  # inf shape
-            x = [letterbox(im, shape1, auto=False)[0] for im in ims]  # pad
-            x = np.ascontiguousarray(np.array(x).transpose((0, 3, 1, 2)))  # stack and BHWC to BCHW
-            x = torch.from_numpy(x).to(p.device).type_as(p) / 255  # uint8 to fp16/32
+            if self.gpu_letterbox and p.device.type != "cpu":
+                x = self._letterbox(ims, shape1, p)  # uint8 upload, resize and pad on device
+            else:
+                x = [letterbox(im, shape1, auto=False)[0] for im in ims]  # pad
+                x = torch.from_numpy(np.stack(x)).to(p.device).permute(0, 3, 1, 2)  # stack, BHWC to BCHW view
+                # uint8 to fp16/32, BHWC memory is kept (channels_last, NHWC backends) or made BCHW in the same pass
+                x = x.type_as(p) if self.bhwc else torch.empty(x.shape, dtype=p.dtype, device=p.device).copy_(x)
+                x /= 255  # 0 - 255 to 0.0 - 1.0
 
         with amp.autocast(autocast):
             # Inference
@@ -881,6 +1148,28 @@ class AutoShape(nn.Module):
 
             return Detections(ims, y, files, dt, self.names, x.shape)
 
+    @staticmethod
+    def _letterbox(ims, new_shape, p):
+        """Letterboxes HWC uint8 `ims` to BCHW `new_shape` on the device and dtype of `p`, matching letterbox(auto=False)
+        geometry with bilinear F.interpolate() resizing and gray (114) padding.
+        """
+        h1, w1 = new_shape
+        x = torch.empty((len(ims), 3, h1, w1), device=p.device, dtype=p.dtype, memory_format=torch.channels_last)
+        x.fill_(114 / 255)  # padded batch
+        groups = {}  # image indices by shape, each group is uploaded and resized as one batch
+        for i, im in enumerate(ims):
+            groups.setdefault(im.shape[:2], []).append(i)
+        for (h0, w0), i in groups.items():
+            r = min(h1 / h0, w1 / w0)  # scale ratio (new / old)
+            h, w = int(round(h0 * r)), int(round(w0 * r))  # new unpadded shape
+            top, left = int(round((h1 - h) / 2 - 0.1)), int(round((w1 - w) / 2 - 0.1))
+            y = np.stack([ims[j] for j in i])  # BHWC uint8, a writable copy as np.asarray(PIL image) is read-only
+            y = torch.from_numpy(y).to(p.device).permute(0, 3, 1, 2).float() / 255  # to 0-1 BCHW
+            if (h, w) != (h0, w0):  # resize
+                y = F.interpolate(y, size=(h, w), mode="bilinear", align_corners=False)
+            x[i, :, top : top + h, left : left + w] = y.to(x.dtype)  # index_put needs matching dtypes (FP16 models)
+        return x
+
 
 class Detections:
     # YOLOv5 detections class for inference results
@@ -888,28 +1177,40 @@ class Detections:
         """Initializes the YOLOv5 Detections class with image info, predictions, filenames, timing and normalization."""
         super().__init__()
         d = pred[0].device  # device
-        gn = [torch.tensor([*(im.shape[i] for i in [1, 0, 1, 0]), 1, 1], device=d) for im in ims]  # normalizations
+        self.gn = torch.tensor([[im.shape[i] for i in [1, 0, 1, 0]] + [1, 1] for im in ims], device=d)  # normalizations
         self.ims = ims  # list of images as numpy arrays
         self.pred = pred  # list of tensors pred[0] = (xyxy, conf, cls)
         self.names = names  # class names
         self.files = files  # image filenames
         self.times = times  # profiling times
-        self.xyxy = pred  # xyxy pixels
-        self.xywh = [xyxy2xywh(x) for x in pred]  # xywh pixels
-        self.xyxyn = [x / g for x, g in zip(self.xyxy, gn)]  # xyxy normalized
-        self.xywhn = [x / g for x, g in zip(self.xywh, gn)]  # xywh normalized
+        self.xyxy = pred  # xyxy pixels, xywh, xyxyn and xywhn are computed on first access
         self.n = len(self.pred)  # number of images (batch size)
         self.t = tuple(x.t / self.n * 1e3 for x in times)  # timestamps (ms)
         self.s = tuple(shape)  # inference BCHW shape
 
+    @functools.cached_property
+    def xywh(self):
+        """Returns xywh pixel boxes per image, computed once on first access."""
+        return [xyxy2xywh(x) for x in self.pred]
+
+    @functools.cached_property
+    def xyxyn(self):
+        """Returns xyxy boxes normalized by image size per image, computed once on first access."""
+        return [x / g for x, g in zip(self.xyxy, self.gn)]
+
+    @functools.cached_property
+    def xywhn(self):
+        """Returns xywh boxes normalized by image size per image, computed once on first access."""
+        return [x / g for x, g in zip(self.xywh, self.gn)]
+
     def _run(self, pprint=False, show=False, save=False, crop=False, render=False, labels=True, save_dir=Path("")):
         """Executes model predictions, displaying and/or saving outputs with optional crops and labels."""
         s, crops = "", []
         for i, (im, pred) in enumerate(zip(self.ims, self.pred)):
             s += f"\nimage {i + 1}/{len(self.pred)}: {im.shape[0]}x{im.shape[1]} "  # string
             if pred.shape[0]:
-                for c in pred[:, -1].unique():
-                    n = (pred[:, -1] == c).sum()  # detections per class
+                pred = pred.cpu()  # single device to host copy, per-detection scalar reads below are then sync-free
+                for c, n in zip(*(x.tolist() for x in pred[:, -1].unique(return_counts=True))):  # detections per class
                     s += f"{n} {self.names[int(c)]}{'s' * (n > 1)}, "  # add to string
                 s = s.rstrip(", ")
                 if show or save or render or crop:
@@ -997,9 +1298,19 @@ class Detections:
         new = copy(self)  # return copy
         ca = "xmin", "ymin", "xmax", "ymax", "confidence", "class", "name"  # xyxy columns
         cb = "xcenter", "ycenter", "width", "height", "confidence", "class", "name"  # xywh columns
+        cls, names = [], []  # per-image class indices and names, shared by all box formats
+        for x in self.pred:
+            ci = x[:, 5].cpu().numpy().astype(int)
+            u, i = np.unique(ci, return_inverse=True)  # look up each distinct class name once
+            cls.append(ci)
+            names.append(np.array([self.names[int(j)] for j in u], dtype=object)[i])
         for k, c in zip(["xyxy", "xyxyn", "xywh", "xywhn"], [ca, ca, cb, cb]):
-            a = [[x[:5] + [int(x[5]), self.names[int(x[5])]] for x in x.tolist()] for x in getattr(self, k)]  # update
-            setattr(new, k, [pd.DataFrame(x, columns=c) for x in a])
+            dfs = []
+            for x, ci, ni in zip(getattr(self, k), cls, names):
+                df = pd.DataFrame(x[:, :5].cpu().numpy().astype(np.float64), columns=c[:5])  # float64 as tolist()
+                df[c[5]], df[c[6]] = ci, ni
+                dfs.append(df)
+            setattr(new, k, dfs)  # update
         return new
 
     def tolist(self):
@@ -1051,7 +1362,6 @@ class Proto(nn.Module):
         self.cv3 = Conv(c_, c2)
 
     def forward(self, x):
-        print(x.shape)
         """Performs a forward pass using convolutional layers and upsampling on input tensor `x`."""
         return self.cv3(self.cv2(self.upsample(self.cv1(x))))
 
@@ -1078,8 +1388,6 @@ class Classify(nn.Module):
 class ChannelAttention(nn.Module):
     def __init__(self, channel, reduction=16):
         super().__init__()
-        self.maxpool = nn.AdaptiveMaxPool2d(1)
-        self.avgpool = nn.AdaptiveAvgPool2d(1)
         self.se = nn.Sequential(
             nn.Conv2d(channel, channel // reduction, 1, bias=False),
             nn.ReLU(),
@@ -1088,10 +1396,9 @@ class ChannelAttention(nn.Module):
         self.sigmoid = nn.Sigmoid()
 
     def forward(self, x):
-        max_result = self.maxpool(x)
-        avg_result = self.avgpool(x)
-        max_out = self.se(max_result)
-        avg_out = self.se(avg_result)
+        max_result = x.amax((2, 3), keepdim=True)
+        avg_result = x.mean((2, 3), keepdim=True)
+        max_out, avg_out = self.se(torch.cat([max_result, avg_result], 0)).chunk(2, 0)  # one se pass over 2N
         output = self.sigmoid(max_out + avg_out)
         return output
 
@@ -1103,9 +1410,7 @@ class SpatialAttention(nn.Module):
         self.sigmoid = nn.Sigmoid()
 
     def forward(self, x):
-        max_result, _ = torch.max(x, dim=1, keepdim=True)
-        avg_result = torch.mean(x, dim=1, keepdim=True)
-        result = torch.cat([max_result, avg_result], 1)
+        result = torch.cat([x.amax(1, keepdim=True), x.mean(1, keepdim=True)], 1)  # amax, no argmax indices
         output = self.conv(result)
         output = self.sigmoid(output)
         return output
@@ -1136,25 +1441,29 @@ class CBAM(nn.Module):
         b, c, _, _ = x.size()
         residual = x
         out = x * self.ca(x)
-        out = out * self.sa(out)
-        return out + residual
+        return torch.addcmul(residual, out, self.sa(out))  # residual + out * sa in one kernel
+
+
+def _coord_gate(x, a_h, a_w):
+    # CoordAtt x * sigmoid(a_w) * sigmoid(a_h), shared by the train, eval and fused forwards
+    return x * a_w.sigmoid() * a_h.sigmoid()
+
+
 class h_sigmoid(nn.Module):
     def __init__(self, inplace=True):
         super(h_sigmoid, self).__init__()
         self.relu = nn.ReLU6(inplace=inplace)
     def forward(self, x):
-        return self.relu(x + 3) / 6
+        return F.hardsigmoid(x)  # relu6(x + 3) / 6 in one kernel
 class h_swish(nn.Module):
     def __init__(self, inplace=True):
         super(h_swish, self).__init__()
         self.sigmoid = h_sigmoid(inplace=inplace)
     def forward(self, x):
-        return x * self.sigmoid(x)
+        return F.hardswish(x)  # x * relu6(x + 3) / 6 in one kernel
 class CoordAtt(nn.Module):
     def __init__(self, inp, oup, reduction=32):
         super(CoordAtt, self).__init__()
-        self.pool_h = nn.AdaptiveAvgPool2d((None, 1))
-        self.pool_w = nn.AdaptiveAvgPool2d((1, None))
         mip = max(8, inp // reduction)
         self.conv1 = nn.Conv2d(inp, mip, kernel_size=1, stride=1, padding=0)
         self.bn1 = nn.BatchNorm2d(mip)
@@ -1164,11 +1473,15 @@ class CoordAtt(nn.Module):
     def forward(self, x):
         identity = x
         n, c, h, w = x.size()
+        if not self.training:  # eval BN is a per-channel affine, so run the shared 1x1 conv1 on each pooled branch
+            a_h = self.conv_h(self.act(self.bn1(self.conv1(x.mean(3, keepdim=True)))))  # n*c*h*1
+            a_w = self.conv_w(self.act(self.bn1(self.conv1(x.mean(2, keepdim=True)))))  # n*c*1*w
+            return _coord_gate(identity, a_h, a_w)
         # c*1*W
-        x_h = self.pool_h(x)
+        x_h = x.mean(3, keepdim=True)
         # c*H*1
         # C*1*h
-        x_w = self.pool_w(x).permute(0, 1, 3, 2)
+        x_w = x.mean(2, keepdim=True).permute(0, 1, 3, 2)
         y = torch.cat([x_h, x_w], dim=2)
         # C*1*(h+w)
         y = self.conv1(y)
@@ -1176,12 +1489,106 @@ class CoordAtt(nn.Module):
         y = self.act(y)
         x_h, x_w = torch.split(y, [h, w], dim=2)
         x_w = x_w.permute(0, 1, 3, 2)
-        a_h = self.conv_h(x_h).sigmoid()
-        a_w = self.conv_w(x_w).sigmoid()
-        out = identity * a_w * a_h
-        return out
+        return _coord_gate(identity, self.conv_h(x_h), self.conv_w(x_w))
+
+    def forward_fuse(self, x):
+        a_h = self.conv_h(self.act(self.conv1(x.mean(3, keepdim=True))))  # n*c*h*1, bn1 folded into conv1
+        a_w = self.conv_w(self.act(self.conv1(x.mean(2, keepdim=True))))  # n*c*1*w
+        return _coord_gate(x, a_h, a_w)
+
+    def fuse(self):
+        # fold bn1 into conv1 for inference, see BaseModel.fuse()
+        if hasattr(self, "bn1"):
+            self.conv1 = fuse_conv_and_bn(self.conv1, self.bn1)
+            delattr(self, "bn1")
+            self.forward = self.forward_fuse
+        return self
+
 
 
+class WaveletBank:
+    # Memoizes the DWT levels of each input tensor within one model forward pass (BaseModel._forward_once() opens a
+    # scope), so the wavelet modules reading the same tensor share a single decomposition instead of recomputing it
+    # scopes are skipped while torch.compile traces, so no memo state ends up in its guards
+    # entries are keyed by id(x) and hold x itself, so x stays alive and its id cannot be reused by another tensor until
+    # the entry is dropped, by release(x) after the last wavelet module reading x or when the scope exits
+    _local = threading.local()  # per-thread memo, {(id(x), filters): (x, lls, yh)}
+
+    @classmethod
+    @contextlib.contextmanager
+    def scope(cls):
+        """Shares decompositions between wavelet modules inside the context, typically one model forward pass."""
+        memo, cls._local.memo = getattr(cls._local, "memo", None), {}
+        try:
+            yield
+        finally:
+            cls._local.memo = memo
+
+    @classmethod
+    def release(cls, x):
+        """Drops the shared decompositions of `x` from the current scope, freeing their bands before the scope exits."""
+        memo = getattr(cls._local, "memo", None)
+        for k in [k for k in memo or () if k[0] == id(x)]:
+            del memo[k]
+
+    @classmethod
+    def dwt(cls, dwt, x):
+        """DWTForward `dwt` over all channels of `x` (B, C, H, W), returns yl (B, C, h, w) and yh[j] (B, C, 3, h_j, w_j)
+        with bands LH, HL, HH like pytorch_wavelets.
+        """
+        if dwt.mode not in ("per", "periodization"):  # general pytorch_wavelets path, channels folded into the batch
+            b, c, h, w = x.shape
+            yl, yh = dwt(x.reshape(b * c, 1, h, w))
+            return yl.reshape(b, c, *yl.shape[-2:]), [y.reshape(b, c, *y.shape[-3:]) for y in yh]
+        lls, yh = cls._levels(dwt, x, *cls._lists(dwt, x))
+        return lls[dwt.J - 1], yh[: dwt.J]
+
+    @staticmethod
+    def compiling():
+        """True while torch.compile (torch>=2.1) traces the model, wavelet modules then compute their own DWT."""
+        compiler = getattr(torch, "compiler", None)
+        return bool(compiler is not None and hasattr(compiler, "is_compiling") and compiler.is_compiling())
+
+    @classmethod
+    def _lists(cls, dwt, x):
+        """Per-level (lls, yh) lists of `x` for the filters of `dwt`, shared within a scope, fresh outside one."""
+        memo = None if cls.compiling() else getattr(cls._local, "memo", None)
+        if memo is None:  # outside a scope
+            return [], []
+        key = dwt.__dict__.get("bank_key")  # filter values, modules with the same wavelet share results
+        if key is None:
+            key = tuple(tuple(f.flatten().tolist()) for f in (dwt.h0_col, dwt.h1_col, dwt.h0_row, dwt.h1_row))
+            dwt.bank_key = key
+        return memo.setdefault((id(x), key), (x, [], []))[1:]  # holds x so its id is not reused within the scope
+
+    @staticmethod
+    def memory_format(x):
+        """Memory format of `x`, torch.channels_last for NHWC-strided tensors, so wavelet outputs follow the input."""
+        nhwc = not x.is_contiguous() and x.is_contiguous(memory_format=torch.channels_last)
+        return torch.channels_last if nhwc else torch.contiguous_format
+
+    @staticmethod
+    def _levels(dwt, x, lls, yh):
+        """Extends the per-level LL and high band lists of `x` to `dwt.J` levels."""
+        # periodization is a circular correlation, so each level is one grouped stride-2 conv with the 4 outer-product
+        # kernels of the (already time-reversed) dwt filters, matching pytorch_wavelets' row-then-column filter bank
+        b, c = x.shape[:2]
+        nhwc = WaveletBank.memory_format(x) == torch.channels_last
+        if len(yh) < dwt.J:
+            lo, hi = dwt.h0_col, dwt.h1_col  # (1, 1, L, 1)
+            k = torch.cat((lo * dwt.h0_row, hi * dwt.h0_row, lo * dwt.h1_row, hi * dwt.h1_row))  # (4, 1, L, L)
+            k = k.to(x.dtype).repeat(c, 1, 1, 1)
+            p = k.shape[-1] // 2 - 1  # circular padding
+        while len(yh) < dwt.J:
+            y = lls[-1] if lls else x
+            if y.shape[-2] % 2 or y.shape[-1] % 2:  # odd sizes repeat the last row/column
+                y = F.pad(y, (0, y.shape[-1] % 2, 0, y.shape[-2] % 2), mode="replicate")
+            y = F.conv2d(F.pad(y, (p, p, p, p), mode="circular") if p else y, k, stride=2, groups=c)
+            y = y.view(b, c, 4, *y.shape[-2:])  # LL, LH, HL, HH
+            lls.append(y[:, :, 0].contiguous(memory_format=torch.channels_last) if nhwc else y[:, :, 0])
+            yh.append(y[:, :, 1:])
+        return lls, yh
+
 
 class WaveletTransform_H(nn.Module):
     def __init__(self, in_channels=32, wave='db2'):
@@ -1195,22 +1602,11 @@ class WaveletTransform_H(nn.Module):
         batch_size, channels, height, width = x.size()
         assert channels > 0, "Input should have at least one channel."
 
-        LHs, HLs, HHs = [], [], []
-        for i in range(channels):
-            img = x[:, i, :, :].unsqueeze(1)  # Extract each channel and add channel dimension
-
-            coeffs = self.dwt(img)
-            LH, HL, HH = coeffs[1][0][:, :, 0], coeffs[1][0][:, :, 1], coeffs[1][0][:, :, 2]
-
-            LHs.append(LH)
-            HLs.append(HL)
-            HHs.append(HH)
-
-        LHs = torch.cat(LHs, dim=1)
-        HLs = torch.cat(HLs, dim=1)
-        HHs = torch.cat(HHs, dim=1)
-
-        high_freq = torch.cat((LHs, HLs, HHs), dim=1)
+        _, yh = WaveletBank.dwt(self.dwt, x)
+        b, c, _, h, w = yh[0].shape
+        fmt = WaveletBank.memory_format(x)
+        high_freq = torch.empty((b, 3 * c, h, w), dtype=yh[0].dtype, device=x.device, memory_format=fmt)
+        high_freq.view(b, 3, c, h, w).copy_(yh[0].transpose(1, 2))  # LHs, HLs, HHs in the input's layout
         high_freq = self.conv_out(high_freq)
 
         return high_freq
@@ -1226,17 +1622,9 @@ class WaveletTransform_L(nn.Module):
         batch_size, channels, height, width = x.size()
         assert channels > 0, "Input should have at least one channel."
 
-        LLs = []
-        for i in range(channels):
-            img = x[:, i, :, :].unsqueeze(1)  # Extract each channel and add channel dimension
-
-            coeffs = self.dwt(img)
-            LL = coeffs[0]
-
-            LLs.append(LL)
-
-        LLs = torch.cat(LLs, dim=1)
-        LLs = LLs[:, :, :height // 2, :width // 2]  # Crop to match original image dimensions
+        LLs, _ = WaveletBank.dwt(self.dwt, x)  # periodization gives ceil(H/2) x ceil(W/2)
+        if height % 2 or width % 2:
+            LLs = LLs[:, :, :height // 2, :width // 2]  # Crop odd sizes down to H//2 x W//2
 
         return LLs
 
@@ -1246,151 +1634,46 @@ import torch
 import torch.nn as nn
 from pytorch_wavelets import DWTForward
 
-class WaveletTransform_LL(nn.Module):
-    def __init__(self, wavelet='haar'):
-        super(WaveletTransform_LL, self).__init__()
-        self.dwt = DWTForward(J=1, wave=wavelet, mode='periodization')
+class WaveletBand(nn.Module):
+    # One DWT band of every input channel, the decomposition is shared through WaveletBank by all bands of an input
+    level, band = 1, None  # decomposition level J, high band (0 LH, 1 HL, 2 HH) or None for the LL approximation
 
-    def forward(self, x):
-
-        batch_size, channels, height, width = x.size()
-        assert channels > 0, "输入应该至少有一个通道。"
-
-        LLs = []
-        for i in range(channels):
-            img = x[:, i, :, :].unsqueeze(1)
-            Yl, _ = self.dwt(img)
-            LLs.append(Yl)
-
-        LLs = torch.cat(LLs, dim=1)
-        return LLs
-
-class WaveletTransform_LH(nn.Module):
     def __init__(self, wavelet='haar'):
-        super(WaveletTransform_LH, self).__init__()
-        self.dwt = DWTForward(J=1, wave=wavelet, mode='periodization')
-
-    def forward(self, x):
-        batch_size, channels, height, width = x.size()
-        assert channels > 0, "输入应该至少有一个通道。"
-
-        LHs = []
-        for i in range(channels):
-            img = x[:, i, :, :].unsqueeze(1)
-            _, Yh = self.dwt(img)
-            LHs.append(Yh[0][:, :, 0, :, :])
-
-        LHs = torch.cat(LHs, dim=1)
-        return LHs
-
-class WaveletTransform_HL(nn.Module):
-    def __init__(self, wavelet='haar'):
-        super(WaveletTransform_HL, self).__init__()
-        self.dwt = DWTForward(J=1, wave=wavelet, mode='periodization')
-
-    def forward(self, x):
-        batch_size, channels, height, width = x.size()
-        assert channels > 0, "输入应该至少有一个通道。"
-
-        HLs = []
-        for i in range(channels):
-            img = x[:, i, :, :].unsqueeze(1)
-            _, Yh = self.dwt(img)
-            HLs.append(Yh[0][:, :, 1, :, :])
-
-        HLs = torch.cat(HLs, dim=1)
-        return HLs
-
-class WaveletTransform_HH(nn.Module):
-    def __init__(self, wavelet='haar'):
-        super(WaveletTransform_HH, self).__init__()
-        self.dwt = DWTForward(J=1, wave=wavelet, mode='periodization')
-
-    def forward(self, x):
-        batch_size, channels, height, width = x.size()
-        assert channels > 0, "输入应该至少有一个通道。"
-
-        HHs = []
-        for i in range(channels):
-            img = x[:, i, :, :].unsqueeze(1)
-            _, Yh = self.dwt(img)
-            HHs.append(Yh[0][:, :, 2, :, :])
-
-        HHs = torch.cat(HHs, dim=1)
-        return HHs
-
-class WaveletTransform_LL2(nn.Module):
-    def __init__(self, wavelet='haar'):
-        super(WaveletTransform_LL2, self).__init__()
-        self.dwt = DWTForward(J=2, wave=wavelet, mode='periodization')
-
-    def forward(self, x):
-        batch_size, channels, height, width = x.size()
-        assert channels > 0, "输入应该至少有一个通道。"
-
-        LLs_2 = []
-        for i in range(channels):
-            img = x[:, i, :, :].unsqueeze(1)
-            Yl, _ = self.dwt(img)
-            LLs_2.append(Yl)
-
-        LLs_2 = torch.cat(LLs_2, dim=1)
-        return LLs_2
-
-class WaveletTransform_LH2(nn.Module):
-    def __init__(self, wavelet='haar'):
-        super(WaveletTransform_LH2, self).__init__()
-        self.dwt = DWTForward(J=2, wave=wavelet, mode='periodization')
+        super().__init__()
+        self.dwt = DWTForward(J=self.level, wave=wavelet, mode='periodization')
 
     def forward(self, x):
+        yl, yh = WaveletBank.dwt(self.dwt, x)
+        if self.band is None:
+            return yl
+        y = yh[-1][:, :, self.band]
+        nhwc = WaveletBank.memory_format(x) == torch.channels_last
+        return y.contiguous(memory_format=torch.channels_last) if nhwc else y
 
-        batch_size, channels, height, width = x.size()
-        assert channels > 0, "输入应该至少有一个通道。"
 
-        LHs_2 = []
-        for i in range(channels):
-            img = x[:, i, :, :].unsqueeze(1)
-            _, Yh = self.dwt(img)
-            LHs_2.append(Yh[1][:, :, 0, :, :])
+class WaveletTransform_LL(WaveletBand):
+    level, band = 1, None
 
-        LHs_2 = torch.cat(LHs_2, dim=1)
-        return LHs_2
+class WaveletTransform_LH(WaveletBand):
+    level, band = 1, 0
 
-class WaveletTransform_HL2(nn.Module):
-    def __init__(self, wavelet='haar'):
-        super(WaveletTransform_HL2, self).__init__()
-        self.dwt = DWTForward(J=2, wave=wavelet, mode='periodization')
+class WaveletTransform_HL(WaveletBand):
+    level, band = 1, 1
 
-    def forward(self, x):
-        batch_size, channels, height, width = x.size()
-        assert channels > 0, "输入应该至少有一个通道。"
+class WaveletTransform_HH(WaveletBand):
+    level, band = 1, 2
 
-        HLs_2 = []
-        for i in range(channels):
-            img = x[:, i, :, :].unsqueeze(1)
-            _, Yh = self.dwt(img)
-            HLs_2.append(Yh[1][:, :, 1, :, :])
+class WaveletTransform_LL2(WaveletBand):
+    level, band = 2, None
 
-        HLs_2 = torch.cat(HLs_2, dim=1)
-        return HLs_2
-
-class WaveletTransform_HH2(nn.Module):
-    def __init__(self, wavelet='haar'):
-        super(WaveletTransform_HH2, self).__init__()
-        self.dwt = DWTForward(J=2, wave=wavelet, mode='periodization')
-
-    def forward(self, x):
-        batch_size, channels, height, width = x.size()
-        assert channels > 0, "输入应该至少有一个通道。"
+class WaveletTransform_LH2(WaveletBand):
+    level, band = 2, 0
 
-        HHs_2 = []
-        for i in range(channels):
-            img = x[:, i, :, :].unsqueeze(1)
-            _, Yh = self.dwt(img)
-            HHs_2.append(Yh[1][:, :, 2, :, :])
+class WaveletTransform_HL2(WaveletBand):
+    level, band = 2, 1
 
-        HHs_2 = torch.cat(HHs_2, dim=1)
-        return HHs_2
+class WaveletTransform_HH2(WaveletBand):
+    level, band = 2, 2
 
 
 
@@ -1423,16 +1706,11 @@ class AttentionModule(nn.Module):
         )
 
     def forward(self, x):
-        print(x.shape)
         # Channel Attention
-        avg_out = self.channel_attention(x)
-        max_out = self.channel_attention(x)
-        channel_attention = avg_out + max_out
+        channel_attention = 2 * self.channel_attention(x)  # both branches are the same avg-pool path
 
         # Spatial Attention
-        avg_out = torch.mean(x, dim=1, keepdim=True)
-        max_out, _ = torch.max(x, dim=1, keepdim=True)
-        spatial_attention = torch.cat([avg_out, max_out], dim=1)
+        spatial_attention = torch.cat([x.mean(1, keepdim=True), x.amax(1, keepdim=True)], dim=1)
         spatial_attention = self.spatial_attention(spatial_attention)
 
         # Apply Attention
@@ -8,6 +8,7 @@ import torch
 import torch.nn as nn
 
 from utils.downloads import attempt_download
+from utils.torch_utils import fuse_conv_and_bn
 
 
 class Sum(nn.Module):
@@ -29,7 +30,7 @@ class Sum(nn.Module):
         if self.weight:
             w = torch.sigmoid(self.w) * 2
             for i in self.iter:
-                y = y + x[i + 1] * w[i]
+                y = torch.addcmul(y, x[i + 1], w[i])  # fused y + x * w, no intermediate product tensor
         else:
             for i in self.iter:
                 y = y + x[i + 1]
@@ -68,6 +69,24 @@ class MixConv2d(nn.Module):
         """
         return self.act(self.bn(torch.cat([m(x) for m in self.m], 1)))
 
+    def forward_fuse(self, x):
+        """Performs forward pass with BatchNorm2d folded into each branch conv."""
+        return self.act(torch.cat([m(x) for m in self.m], 1))
+
+    def fuse(self):
+        """Folds the shared BatchNorm2d into the branch convs, slicing its statistics by each branch's channels."""
+        if hasattr(self, "bn"):
+            i = 0
+            for j, m in enumerate(self.m):
+                c = m.out_channels
+                bn = nn.BatchNorm2d(c, eps=self.bn.eps).to(m.weight.device)
+                bn.load_state_dict({k: v[i : i + c] for k, v in self.bn.state_dict().items() if v.ndim}, strict=False)
+                self.m[j] = fuse_conv_and_bn(m, bn)
+                i += c
+            delattr(self, "bn")
+            self.forward = self.forward_fuse
+        return self
+
 
 class Ensemble(nn.ModuleList):
     """Ensemble of models."""
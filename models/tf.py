@@ -189,6 +189,7 @@ class TFFocus(keras.layers.Layer):
         """
         super().__init__()
         self.conv = TFConv(c1 * 4, c2, k, s, p, g, act, w.conv)
+        self.fused = w.forward == w.forward_fuse  # Focus.fuse() permutes conv inputs to pixel_unshuffle() order
 
     def call(self, inputs):
         """
@@ -196,6 +197,9 @@ class TFFocus(keras.layers.Layer):
 
         Example x(b,w,h,c) -> y(b,w/2,h/2,4c).
         """
+        if self.fused:  # pixel_unshuffle() channel order (c, dy, dx)
+            x = tf.stack([inputs[:, dy::2, dx::2, :] for dy in (0, 1) for dx in (0, 1)], 4)  # x(b,w/2,h/2,c,4)
+            return self.conv(tf.reshape(x, [-1, *x.shape[1:3], 4 * x.shape[3]]))
         inputs = [inputs[:, ::2, ::2, :], inputs[:, 1::2, ::2, :], inputs[:, ::2, 1::2, :], inputs[:, 1::2, 1::2, :]]
         return self.conv(tf.concat(inputs, 3))
 
@@ -272,10 +276,11 @@ class TFBottleneckCSP(keras.layers.Layer):
         super().__init__()
         c_ = int(c2 * e)  # hidden channels
         self.cv1 = TFConv(c1, c_, 1, 1, w=w.cv1)
-        self.cv2 = TFConv2d(c1, c_, 1, 1, bias=False, w=w.cv2)
-        self.cv3 = TFConv2d(c_, c_, 1, 1, bias=False, w=w.cv3)
+        fused = not hasattr(w, "bn")  # BottleneckCSP.fuse() folds bn into biased cv3/cv2
+        self.cv2 = TFConv2d(c1, c_, 1, 1, bias=fused, w=w.cv2)
+        self.cv3 = TFConv2d(c_, c_, 1, 1, bias=fused, w=w.cv3)
         self.cv4 = TFConv(2 * c_, c2, 1, 1, w=w.cv4)
-        self.bn = TFBN(w.bn)
+        self.bn = tf.identity if fused else TFBN(w.bn)
         self.act = lambda x: keras.activations.swish(x)
         self.m = keras.Sequential([TFBottleneck(c_, c_, shortcut, g, e=1.0, w=w.m[j]) for j in range(n)])
 
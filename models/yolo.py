@@ -39,6 +39,7 @@ from models.common import (
     Concat,
     Contract,
     Conv,
+    CoordAtt,
     CrossConv,
     DetectMultiBackend,
     DWConv,
@@ -49,7 +50,9 @@ from models.common import (
     GhostConv,
     Proto,
     SCDown,
-    AttentionModule, WaveletTransform_H, WaveletTransform_L,
+    TransformerBlock,
+    TransformerLayer,
+    AttentionModule, WaveletBand, WaveletBank, WaveletTransform_H, WaveletTransform_L,
     WaveletTransform_LL, WaveletTransform_LH, WaveletTransform_HL, WaveletTransform_HH,
     WaveletTransform_LL2, WaveletTransform_LH2, WaveletTransform_HL2, WaveletTransform_HH2
 
@@ -59,7 +62,6 @@ from utils.autoanchor import check_anchor_order
 from utils.general import LOGGER, check_version, check_yaml, colorstr, make_divisible, print_args
 from utils.plots import feature_visualization
 from utils.torch_utils import (
-    fuse_conv_and_bn,
     initialize_weights,
     model_info,
     profile,
@@ -154,17 +156,33 @@ class BaseModel(nn.Module):
 
     def _forward_once(self, x, profile=False, visualize=False):
         y, dt = [], []  # outputs
-        for m in self.model:
-            if m.f != -1:  # if not from previous layer
-                x = y[m.f] if isinstance(m.f, int) else [x if j == -1 else y[j] for j in m.f]  # from earlier layers
-            if profile:
-                self._profile_one_layer(m, x, dt)
-            x = m(x)  # run
-            y.append(x if m.i in self.save else None)  # save output
-            if visualize:
-                feature_visualization(x, m.type, m.i, save_dir=visualize)
+        share = not (profile or WaveletBank.compiling())  # share wavelet decompositions of an input
+        release = self._wavelet_release() if share else ()
+        with WaveletBank.scope() if share else contextlib.nullcontext():
+            for m in self.model:
+                if m.f != -1:  # if not from previous layer
+                    x = y[m.f] if isinstance(m.f, int) else [x if j == -1 else y[j] for j in m.f]  # from earlier layers
+                if profile:
+                    self._profile_one_layer(m, x, dt)
+                xi, x = x, m(x)  # run
+                if m.i in release:  # last wavelet layer reading xi, free its shared decompositions
+                    WaveletBank.release(xi)
+                y.append(x if m.i in self.save else None)  # save output
+                if visualize:
+                    feature_visualization(x, m.type, m.i, save_dir=visualize)
         return x
 
+    def _wavelet_release(self):
+        """Returns the last wavelet layer index for each wavelet input, its decompositions are released after it."""
+        if "_release" not in self.__dict__:  # layers are fixed after parse_model(), build once
+            wavelets = WaveletBand, WaveletTransform_H, WaveletTransform_L  # modules reading WaveletBank.dwt()
+            last = {}  # input layer index -> last wavelet layer reading it
+            for m in self.model:
+                if isinstance(m.f, int) and any(isinstance(x, wavelets) for x in m.modules()):
+                    last[m.i + m.f if m.f < 0 else m.f] = m.i
+            self._release = set(last.values())
+        return self._release
+
     def _profile_one_layer(self, m, x, dt):
         c = m == self.model[-1]  # is final layer, copy input as inplace fix
         o = thop.profile(m, inputs=(x.copy() if c else x,), verbose=False)[0] / 1e9 * 2 if thop else 0  # FLOPs
@@ -181,10 +199,22 @@ class BaseModel(nn.Module):
     def fuse(self):  # fuse model Conv2d() + BatchNorm2d() layers
         LOGGER.info("Fusing layers... ")
         for m in self.model.modules():
-            if isinstance(m, (Conv, DWConv)) and hasattr(m, "bn"):
-                m.conv = fuse_conv_and_bn(m.conv, m.bn)  # update conv
-                delattr(m, "bn")  # remove batchnorm
-                m.forward = m.forward_fuse  # update forward
+            if isinstance(
+                m,
+                (
+                    Conv,
+                    DWConv,
+                    Focus,
+                    Bottleneck,
+                    BottleneckCSP,
+                    CrossConv,
+                    MixConv2d,
+                    TransformerLayer,
+                    TransformerBlock,
+                    CoordAtt,
+                ),
+            ):  # modules with a fuse() inference rewrite
+                m.fuse()
         self.info()
         return self
 
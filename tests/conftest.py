@@ -0,0 +1,31 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Pytest configuration and shared fixtures for the YOLOv5 unit tests, run with 'pytest tests'."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]  # YOLOv5 root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+
+@pytest.fixture
+def randomize_bn():
+    """Returns a function giving every BatchNorm2d of a model non-trivial affine parameters and running statistics, so
+    fused vs unfused comparisons actually exercise Conv+BN folding.
+    """
+    torch = pytest.importorskip("torch")
+
+    def randomize(model):
+        for m in model.modules():
+            if isinstance(m, torch.nn.BatchNorm2d):
+                m.weight.data.uniform_(0.5, 1.5)
+                m.bias.data.uniform_(-0.5, 0.5)
+                m.running_mean.uniform_(-0.5, 0.5)
+                m.running_var.uniform_(0.5, 1.5)
+        return model
+
+    return randomize
@@ -0,0 +1,231 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Tests for models/common.py and models/experimental.py inference rewrites, each checked against the unfused module or
+the original reference computation.
+"""
+
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("pytorch_wavelets")  # imported by models.common
+
+import torch.nn.functional as F  # noqa: E402
+
+from models.common import (  # noqa: E402
+    CBAM,
+    SPP,
+    SPPF,
+    AttentionModule,
+    Bottleneck,
+    BottleneckCSP,
+    ChannelAttention,
+    Contract,
+    Conv,
+    CoordAtt,
+    CrossConv,
+    Detections,
+    DWConv,
+    Expand,
+    Focus,
+    SpatialAttention,
+    TransformerBlock,
+    TransformerLayer,
+)
+from models.experimental import MixConv2d  # noqa: E402
+from utils.general import Profile, xyxy2xywh  # noqa: E402
+
+FUSE_CASES = [
+    (lambda: Conv(8, 16, 3, 2), (2, 8, 16, 16)),
+    (lambda: DWConv(16, 16, 3), (2, 16, 16, 16)),
+    (lambda: DWConv(8, 16, 3), (2, 8, 16, 16)),
+    (lambda: Focus(3, 16, 3), (2, 3, 16, 16)),
+    (lambda: Bottleneck(16, 16), (2, 16, 16, 16)),
+    (lambda: Bottleneck(16, 16, shortcut=False), (2, 16, 16, 16)),
+    (lambda: BottleneckCSP(16, 16, n=2), (2, 16, 16, 16)),
+    (lambda: CrossConv(16, 16, shortcut=True), (2, 16, 16, 16)),
+    (lambda: MixConv2d(16, 16, (1, 3)), (2, 16, 16, 16)),
+    (lambda: MixConv2d(8, 24, (1, 3, 5)), (2, 8, 16, 16)),
+    (lambda: TransformerLayer(16, 4), (10, 2, 16)),
+    (lambda: TransformerBlock(16, 16, 4, 2), (2, 16, 4, 4)),
+    (lambda: TransformerBlock(8, 16, 4, 1), (2, 8, 4, 4)),
+    (lambda: CoordAtt(16, 16), (2, 16, 12, 8)),
+]
+
+
+def fuse(model):
+    """Calls fuse() on every submodule that has one, like BaseModel.fuse(), and returns `model`."""
+    for m in model.modules():
+        if hasattr(m, "fuse"):
+            m.fuse()
+    return model
+
+
+@pytest.mark.parametrize("build, shape", FUSE_CASES)
+def test_fuse_matches_unfused(build, shape, randomize_bn):
+    """Fused inference modules reproduce the unfused eval outputs and fuse() is idempotent."""
+    torch.manual_seed(0)
+    m = randomize_bn(build()).eval()
+    x = torch.randn(shape)
+    fused = fuse(deepcopy(m))
+    with torch.no_grad():
+        y = m(x)
+        torch.testing.assert_close(fused(x), y, rtol=1e-4, atol=1e-5)
+        torch.testing.assert_close(fuse(fused)(x), y, rtol=1e-4, atol=1e-5)  # second fuse() is a no-op
+
+
+@pytest.mark.parametrize("build, shape", FUSE_CASES)
+def test_fuse_returns_self(build, shape):
+    """Every fuse() returns its own module, so it can be chained like BaseModel.fuse()."""
+    for m in build().eval().modules():
+        if hasattr(m, "fuse"):
+            assert m.fuse() is m
+
+
+def test_coordatt_eval_matches_reference(randomize_bn):
+    """CoordAtt's eval path matches the original concat -> conv1 -> bn1 -> split formulation."""
+    torch.manual_seed(0)
+    m = randomize_bn(CoordAtt(16, 16)).eval()
+    x = torch.randn(2, 16, 12, 8)
+    with torch.no_grad():
+        h, w = x.shape[2:]
+        y = torch.cat([F.adaptive_avg_pool2d(x, (None, 1)), F.adaptive_avg_pool2d(x, (1, None)).permute(0, 1, 3, 2)], 2)
+        x_h, x_w = torch.split(m.act(m.bn1(m.conv1(y))), [h, w], dim=2)
+        ref = x * m.conv_w(x_w.permute(0, 1, 3, 2)).sigmoid() * m.conv_h(x_h).sigmoid()
+        torch.testing.assert_close(m(x), ref, rtol=1e-4, atol=1e-6)
+
+
+def channel_attention_reference(m, x):
+    """Original ChannelAttention forward, the se MLP run separately on the adaptive max and avg pooled descriptors."""
+    return torch.sigmoid(m.se(F.adaptive_max_pool2d(x, 1)) + m.se(F.adaptive_avg_pool2d(x, 1)))
+
+
+def test_channel_attention_matches_reference():
+    """ChannelAttention's single se pass over the stacked pools matches two separate se passes."""
+    torch.manual_seed(0)
+    m = ChannelAttention(32, 8).eval()
+    x = torch.randn(2, 32, 9, 7)
+    with torch.no_grad():
+        torch.testing.assert_close(m(x), channel_attention_reference(m, x), rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize("memory_format", [torch.contiguous_format, torch.channels_last])
+def test_channel_attention_pools(memory_format):
+    """ChannelAttention's amax/mean reductions equal the adaptive max/avg pools for NCHW and NHWC inputs."""
+    torch.manual_seed(0)
+    m = ChannelAttention(16, 4).eval()
+    x = torch.randn(2, 16, 11, 13).contiguous(memory_format=memory_format)
+    with torch.no_grad():
+        torch.testing.assert_close(m(x), channel_attention_reference(m, x), rtol=1e-5, atol=1e-6)
+
+
+def test_spatial_attention_matches_reference():
+    """SpatialAttention's amax descriptor matches the original torch.max(x, 1) values."""
+    torch.manual_seed(0)
+    m = SpatialAttention(7).eval()
+    x = torch.randn(2, 16, 12, 10)
+    with torch.no_grad():
+        y = torch.cat([torch.max(x, dim=1, keepdim=True)[0], torch.mean(x, dim=1, keepdim=True)], 1)
+        torch.testing.assert_close(m(x), m.sigmoid(m.conv(y)))
+
+
+def test_cbam_matches_reference():
+    """CBAM's addcmul tail matches the original out * sa(out) + residual."""
+    torch.manual_seed(0)
+    m = CBAM(32, 8, 7).eval()
+    x = torch.randn(2, 32, 12, 10)
+    with torch.no_grad():
+        out = x * m.ca(x)
+        torch.testing.assert_close(m(x), out * m.sa(out) + x, rtol=1e-5, atol=1e-6)
+
+
+def test_attention_module_matches_reference():
+    """AttentionModule's single channel attention call matches the original sum of two identical calls."""
+    torch.manual_seed(0)
+    m = AttentionModule().eval()
+    x = torch.randn(2, 3, 16, 12)
+    with torch.no_grad():
+        ca = m.channel_attention(x) + m.channel_attention(x)
+        y = torch.cat([torch.mean(x, dim=1, keepdim=True), torch.max(x, dim=1, keepdim=True)[0]], 1)
+        torch.testing.assert_close(m(x), x * ca * m.spatial_attention(y))
+
+
+@pytest.mark.parametrize("k", [(5, 9, 13), (3, 5, 7), (9, 5, 13)])
+def test_spp_matches_parallel_pools(k):
+    """SPP's chained max pools equal independent k x k pools of the cv1 output, unsorted kernels included."""
+    torch.manual_seed(0)
+    m = SPP(8, 16, k).eval()
+    x = torch.randn(2, 8, 20, 20)
+    with torch.no_grad():
+        y = m.cv1(x)
+        ref = m.cv2(torch.cat([y] + [F.max_pool2d(y, ki, 1, ki // 2) for ki in k], 1))
+        torch.testing.assert_close(m(x), ref)
+
+
+def test_sppf_matches_spp():
+    """SPPF(k=5) is SPP(k=(5, 9, 13)) with the same weights."""
+    torch.manual_seed(0)
+    a, b = SPPF(8, 16, 5).eval(), SPP(8, 16, (5, 9, 13)).eval()
+    b.load_state_dict(a.state_dict())
+    x = torch.randn(2, 8, 20, 20)
+    with torch.no_grad():
+        torch.testing.assert_close(a(x), b(x))
+
+
+@pytest.mark.parametrize("c", [1, 3])
+def test_contract(c):
+    """Contract matches the original view/permute space-to-depth, c=1 taking the pixel_unshuffle() shortcut."""
+    x = torch.randn(2, c, 8, 12)
+    b, _, h, w = x.shape
+    ref = x.view(b, c, h // 2, 2, w // 2, 2).permute(0, 3, 5, 1, 2, 4).reshape(b, c * 4, h // 2, w // 2)
+    torch.testing.assert_close(Contract(2)(x), ref, rtol=0, atol=0)
+
+
+@pytest.mark.parametrize("c", [4, 8])
+def test_expand(c):
+    """Expand matches the original view/permute depth-to-space, c=4 taking the pixel_shuffle() shortcut."""
+    x = torch.randn(2, c, 6, 5)
+    b, _, h, w = x.shape
+    ref = x.view(b, 2, 2, c // 4, h, w).permute(0, 3, 4, 1, 5, 2).reshape(b, c // 4, h * 2, w * 2)
+    torch.testing.assert_close(Expand(2)(x), ref, rtol=0, atol=0)
+
+
+def detections():
+    """Two-image Detections with five boxes on the first image and none on the second."""
+    torch.manual_seed(0)
+    ims = [np.zeros((48, 64, 3), dtype=np.uint8), np.zeros((32, 40, 3), dtype=np.uint8)]
+    xy = torch.rand(5, 2) * 30
+    p0 = torch.cat((xy, xy + torch.rand(5, 2) * 10, torch.rand(5, 1), torch.tensor([[0.0], [2], [1], [2], [0]])), 1)
+    names = {0: "person", 1: "bicycle", 2: "car"}
+    return Detections(ims, [p0, torch.zeros((0, 6))], ["a.jpg", "b.jpg"], (Profile(),) * 3, names, (2, 3, 64, 64))
+
+
+def test_detections_pandas():
+    """Detections.pandas() frames match the original per-row list construction."""
+    d = detections()
+    df = d.pandas()
+    for k in "xyxy", "xyxyn", "xywh", "xywhn":
+        for x, frame in zip(getattr(d, k), getattr(df, k)):
+            rows = [r[:5] + [int(r[5]), d.names[int(r[5])]] for r in x.tolist()]
+            assert frame.values.tolist() == rows
+            assert len(frame.columns) == 7
+
+
+def test_detections_box_formats():
+    """Detections box formats match the original per-image conversions and normalization gains."""
+    d = detections()
+    gn = [torch.tensor([*(im.shape[i] for i in [1, 0, 1, 0]), 1, 1]) for im in d.ims]
+    xywh = [xyxy2xywh(x) for x in d.pred]
+    for a, b in zip(d.xywh, xywh):
+        torch.testing.assert_close(a, b)
+    for a, b in zip(d.xyxyn, [x / g for x, g in zip(d.pred, gn)]):
+        torch.testing.assert_close(a, b)
+    for a, b in zip(d.xywhn, [x / g for x, g in zip(xywh, gn)]):
+        torch.testing.assert_close(a, b)
+
+
+def test_detections_str():
+    """Detections string summary counts the classes of each image."""
+    s = str(detections())
+    assert "2 persons" in s and "2 cars" in s and "1 bicycle" in s
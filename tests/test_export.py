@@ -0,0 +1,53 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Tests for the fused models export.py converts, loaded the same way with attempt_load(fuse=True)."""
+
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("pytorch_wavelets")  # imported by models.common
+
+from models.experimental import attempt_load  # noqa: E402
+from models.yolo import DetectionModel  # noqa: E402
+
+CFG = {  # Focus and BottleneckCSP, whose fused layers differ from their unfused ones
+    "nc": 2,
+    "depth_multiple": 1.0,
+    "width_multiple": 1.0,
+    "anchors": [[10, 13, 16, 30, 33, 23]],
+    "backbone": [[-1, 1, "Focus", [16, 3]], [-1, 1, "Conv", [32, 3, 2]], [-1, 2, "BottleneckCSP", [32]]],
+    "head": [[[2], 1, "Detect", ["nc", "anchors"]]],
+}
+IMGSZ = (64, 64)
+
+
+@pytest.fixture
+def weights(tmp_path, randomize_bn):
+    """Path of a saved checkpoint of a randomly initialized CFG model."""
+    torch.manual_seed(0)
+    f = tmp_path / "model.pt"
+    torch.save({"model": randomize_bn(DetectionModel(deepcopy(CFG))).eval()}, f)
+    return f
+
+
+def test_attempt_load_fuse_matches_unfused(weights):
+    """attempt_load(fuse=True), the export.py loading path, keeps the unfused PyTorch outputs."""
+    im = torch.rand(1, 3, *IMGSZ)
+    with torch.no_grad():
+        y = [attempt_load(weights, fuse=fuse)(im)[0] for fuse in (False, True)]
+    torch.testing.assert_close(y[1], y[0], rtol=1e-4, atol=1e-4)
+
+
+def test_tf_model_fuse_matches_unfused(weights):
+    """TFModel of the fused model, as built by export.py, matches TFModel of the unfused model."""
+    tf = pytest.importorskip("tensorflow")
+    from models.tf import TFModel
+
+    im = tf.constant(np.random.default_rng(0).random((1, *IMGSZ, 3), dtype=np.float32))  # BHWC
+    y = []
+    for fuse in False, True:
+        model = attempt_load(weights, fuse=fuse)
+        y.append(TFModel(cfg=model.yaml, model=model, nc=model.nc, imgsz=IMGSZ).predict(im)[0].numpy())
+    np.testing.assert_allclose(y[1], y[0], rtol=1e-4, atol=1e-4)
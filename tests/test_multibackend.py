@@ -0,0 +1,92 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Tests for the DetectMultiBackend PyTorch inference options, each checked against plain eager inference on CPU."""
+
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("pytorch_wavelets")  # imported by models.common
+
+from models.common import DetectMultiBackend  # noqa: E402
+from models.yolo import DetectionModel  # noqa: E402
+from utils.general import LOGGER  # noqa: E402
+
+MODELS = Path(__file__).resolve().parents[1] / "models"
+IMGSZ = (1, 3, 64, 64)
+
+
+@pytest.fixture
+def weights(tmp_path, randomize_bn):
+    """Returns a function saving a randomly initialized DetectionModel checkpoint of `cfg` and returning its path."""
+
+    def save(cfg="yolov5n.yaml"):
+        torch.manual_seed(0)
+        f = tmp_path / f"{Path(cfg).stem}.pt"
+        torch.save({"model": randomize_bn(DetectionModel(MODELS / cfg)).eval()}, f)
+        return f
+
+    return save
+
+
+def infer(model, im):
+    """Predictions of DetectMultiBackend `model` for `im`."""
+    with torch.no_grad():
+        y = model(im)
+    return y[0] if isinstance(y, (list, tuple)) else y
+
+
+def test_jit_opt_matches_eager(weights):
+    """jit_opt's traced and optimized TorchScript model reproduces the eager outputs at the warmup shape."""
+    w = weights()
+    eager, traced = DetectMultiBackend(w), DetectMultiBackend(w, jit_opt=True)
+    traced.warmup(imgsz=IMGSZ)
+    assert traced.model_jit is not None
+    im = torch.rand(IMGSZ)
+    torch.testing.assert_close(infer(traced, im), infer(eager, im), rtol=1e-4, atol=1e-4)
+
+
+def test_jit_opt_other_shapes(weights):
+    """Inputs with a different shape than the traced warmup input run through the eager model instead of failing."""
+    w = weights()
+    eager, traced = DetectMultiBackend(w), DetectMultiBackend(w, jit_opt=True)
+    traced.warmup(imgsz=IMGSZ)
+    for shape in IMGSZ, (1, 3, 64, 96), (2, 3, 64, 64), IMGSZ:
+        im = torch.rand(shape)
+        torch.testing.assert_close(infer(traced, im), infer(eager, im), rtol=1e-4, atol=1e-4)
+
+
+def test_int8_quantizes_linear(weights):
+    """int8 swaps the transformer Linear layers for dynamic INT8 ones and stays close to FP32 inference."""
+    w = weights("hub/yolov5s-transformer.yaml")
+    fp32, int8 = DetectMultiBackend(w), DetectMultiBackend(w, int8=True)
+    assert any("quantized" in type(m).__module__ for m in int8.model.modules())
+    im = torch.rand(IMGSZ)
+    y, ref = infer(int8, im), infer(fp32, im)
+    assert (y - ref).abs().mean() < 0.05 * ref.abs().mean()
+
+
+def test_int8_without_linear_warns(weights, monkeypatch):
+    """int8 on a model without Linear layers warns and keeps the FP32 model."""
+    messages = []
+    monkeypatch.setattr(LOGGER, "warning", messages.append)
+    model = DetectMultiBackend(weights(), int8=True)
+    assert not model.int8
+    assert any("int8" in m for m in messages)
+
+
+def test_torch_compile_falls_back_to_eager(weights, monkeypatch):
+    """A failing torch.compile leaves the eager model in place, with the same outputs."""
+    if not hasattr(torch, "compile"):
+        pytest.skip("torch.compile requires torch>=2.0")
+
+    def compile(*args, **kwargs):
+        raise RuntimeError("compile failed")
+
+    monkeypatch.setattr(torch, "compile", compile)
+    w = weights()
+    eager, compiled = DetectMultiBackend(w), DetectMultiBackend(w, torch_compile=True)
+    compiled.warmup(imgsz=IMGSZ)
+    assert compiled.model_jit is None
+    im = torch.rand(IMGSZ)
+    torch.testing.assert_close(infer(compiled, im), infer(eager, im))
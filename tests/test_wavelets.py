@@ -0,0 +1,166 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Tests for the grouped-conv DWT and the WaveletTransform_* modules against pytorch_wavelets DWTForward."""
+
+import contextlib
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytorch_wavelets = pytest.importorskip("pytorch_wavelets")
+
+from models.common import (  # noqa: E402
+    WaveletBank,
+    WaveletTransform_H,
+    WaveletTransform_HH,
+    WaveletTransform_HH2,
+    WaveletTransform_HL,
+    WaveletTransform_HL2,
+    WaveletTransform_L,
+    WaveletTransform_LH,
+    WaveletTransform_LH2,
+    WaveletTransform_LL,
+    WaveletTransform_LL2,
+)
+
+DWTForward = pytorch_wavelets.DWTForward
+SHAPES = [(2, 3, 32, 32), (1, 4, 33, 31), (2, 2, 18, 22)]  # even, odd and odd at level 2
+BANDS = [
+    (WaveletTransform_LL, 1, None),
+    (WaveletTransform_LH, 1, 0),
+    (WaveletTransform_HL, 1, 1),
+    (WaveletTransform_HH, 1, 2),
+    (WaveletTransform_LL2, 2, None),
+    (WaveletTransform_LH2, 2, 0),
+    (WaveletTransform_HL2, 2, 1),
+    (WaveletTransform_HH2, 2, 2),
+]
+
+
+def reference(dwt, x, band):
+    """Original per-channel DWTForward loop of the WaveletTransform_* modules, `band` None for LL."""
+    yl, yh = zip(*(dwt(x[:, i : i + 1]) for i in range(x.shape[1])))
+    if band is None:
+        return torch.cat(yl, 1)
+    return torch.cat([y[-1][:, :, band] for y in yh], 1)
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("wave", ["haar", "db2"])
+@pytest.mark.parametrize("J", [1, 2])
+def test_dwt_matches_pytorch_wavelets(shape, wave, J):
+    """WaveletBank.dwt() equals DWTForward for all levels and bands, inside and outside a sharing scope."""
+    torch.manual_seed(0)
+    dwt = DWTForward(J=J, wave=wave, mode="periodization")
+    x = torch.randn(shape)
+    yl, yh = dwt(x)
+    for share in False, True:
+        with WaveletBank.scope() if share else contextlib.nullcontext():
+            for _ in range(2):  # second call is served from the memo inside a scope
+                yl2, yh2 = WaveletBank.dwt(dwt, x)
+                torch.testing.assert_close(yl2, yl, rtol=1e-5, atol=1e-5)
+                assert len(yh2) == J
+                for a, b in zip(yh2, yh):
+                    torch.testing.assert_close(a, b, rtol=1e-5, atol=1e-5)
+
+
+def test_dwt_zero_mode_fallback():
+    """Non-periodization modes use the pytorch_wavelets path with the same channel layout."""
+    torch.manual_seed(0)
+    dwt = DWTForward(J=2, wave="db2", mode="zero")
+    x = torch.randn(2, 3, 20, 20)
+    yl, yh = dwt(x)
+    yl2, yh2 = WaveletBank.dwt(dwt, x)
+    torch.testing.assert_close(yl2, yl)
+    for a, b in zip(yh2, yh):
+        torch.testing.assert_close(a, b)
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("module, J, band", BANDS)
+def test_band_modules(module, J, band, shape):
+    """Each band module matches its original per-channel implementation and band modules share one decomposition."""
+    torch.manual_seed(0)
+    m = module()
+    x = torch.randn(shape)
+    ref = reference(DWTForward(J=J, wave="haar", mode="periodization"), x, band)
+    torch.testing.assert_close(m(x), ref, rtol=1e-5, atol=1e-5)
+    with WaveletBank.scope():
+        others = [b() for b, *_ in BANDS]
+        outs = [b(x) for b in others]  # fill the memo with every level and band of x
+        torch.testing.assert_close(m(x), ref, rtol=1e-5, atol=1e-5)
+    for b, (_, j, bd) in zip(outs, BANDS):
+        torch.testing.assert_close(b, reference(DWTForward(J=j, wave="haar", mode="periodization"), x, bd))
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_h_and_l_modules(shape):
+    """WaveletTransform_H and _L match their original per-channel implementations."""
+    torch.manual_seed(0)
+    b, c, h, w = shape
+    x = torch.randn(shape)
+    mh, ml = WaveletTransform_H(c).eval(), WaveletTransform_L().eval()
+    dwt = DWTForward(J=1, wave="db2", mode="periodization")
+    with torch.no_grad():
+        ref_h = mh.conv_out(torch.cat([reference(dwt, x, i) for i in range(3)], 1))  # LHs, HLs, HHs
+        ref_l = reference(dwt, x, None)[:, :, : h // 2, : w // 2]
+        torch.testing.assert_close(mh(x), ref_h, rtol=1e-5, atol=1e-5)
+        torch.testing.assert_close(ml(x), ref_l, rtol=1e-5, atol=1e-5)
+
+
+def test_channels_last():
+    """NHWC inputs give the same values and the band modules return dense channels_last outputs."""
+    torch.manual_seed(0)
+    x = torch.randn(2, 4, 32, 32)
+    xc = x.contiguous(memory_format=torch.channels_last)
+    for m in WaveletTransform_LL(), WaveletTransform_HL2(), WaveletTransform_H(4).eval():
+        with torch.no_grad():
+            y, yc = m(x), m(xc)
+        torch.testing.assert_close(yc, y, rtol=1e-5, atol=1e-5)
+        if not isinstance(m, WaveletTransform_H):  # H output layout is chosen by the conv_out backend
+            assert yc.is_contiguous(memory_format=torch.channels_last)
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_l_output_size(shape):
+    """WaveletTransform_L returns (H // 2, W // 2) maps, even sizes return the LL band as computed."""
+    torch.manual_seed(0)
+    b, c, h, w = shape
+    x = torch.randn(shape)
+    m = WaveletTransform_L()
+    y = m(x)
+    assert y.shape == (b, c, h // 2, w // 2)
+    if h % 2 == 0 and w % 2 == 0:
+        torch.testing.assert_close(y, WaveletBank.dwt(m.dwt, x)[0], rtol=0, atol=0)
+
+
+def test_scope_is_restored():
+    """WaveletBank.scope() nests and restores the enclosing memo on exit."""
+    with WaveletBank.scope():
+        outer = WaveletBank._local.memo
+        with WaveletBank.scope():
+            assert WaveletBank._local.memo is not outer
+        assert WaveletBank._local.memo is outer
+    assert WaveletBank._local.memo is None
+
+
+def test_compiling_skips_memo(monkeypatch):
+    """While torch.compile traces, WaveletBank.dwt() computes fresh results and leaves the scope's memo untouched."""
+    monkeypatch.setattr(WaveletBank, "compiling", staticmethod(lambda: True))
+    dwt, x = DWTForward(J=1, wave="haar", mode="periodization"), torch.randn(1, 2, 8, 8)
+    with WaveletBank.scope():
+        WaveletBank.dwt(dwt, x)
+        assert not WaveletBank._local.memo
+
+
+def test_release():
+    """WaveletBank.release() drops all shared decompositions of one tensor and keeps those of other tensors."""
+    torch.manual_seed(0)
+    x, z = torch.randn(1, 2, 8, 8), torch.randn(1, 2, 8, 8)
+    with WaveletBank.scope():
+        for t in x, z:
+            WaveletTransform_LL()(t)  # haar
+            WaveletTransform_L()(t)  # db2
+        assert len(WaveletBank._local.memo) == 4
+        WaveletBank.release(x)
+        assert {k[0] for k in WaveletBank._local.memo} == {id(z)}
+    WaveletBank.release(x)  # no-op outside a scope
@@ -0,0 +1,40 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Tests for models/yolo.py DetectionModel fusing and inference on the stock and wavelet (2DWT) model configurations."""
+
+from copy import deepcopy
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("pytorch_wavelets")  # imported by models.common
+
+from models.common import WaveletBank  # noqa: E402
+from models.yolo import DetectionModel  # noqa: E402
+
+MODELS = Path(__file__).resolve().parents[1] / "models"
+CFGS = [MODELS / "yolov5s.yaml"] + sorted(MODELS.glob("yolov5s_2DWT-*.yaml"))
+
+
+@pytest.mark.parametrize("cfg", CFGS, ids=lambda x: x.stem)
+def test_fuse_matches_unfused(cfg, randomize_bn):
+    """BaseModel.fuse() keeps the inference outputs of every model configuration."""
+    torch.manual_seed(0)
+    model = randomize_bn(DetectionModel(cfg)).eval()
+    fused = deepcopy(model).fuse()
+    im = torch.rand(2, 3, 128, 96)
+    with torch.no_grad():
+        y = model(im)[0]
+        torch.testing.assert_close(fused(im)[0], y, rtol=1e-4, atol=1e-3)
+
+
+@pytest.mark.parametrize("cfg", CFGS[1:], ids=lambda x: x.stem)
+def test_wavelet_sharing_matches_unshared(cfg, monkeypatch):
+    """Sharing wavelet decompositions within a forward pass, and releasing them early, keeps the outputs."""
+    torch.manual_seed(0)
+    model = DetectionModel(cfg).eval()
+    im = torch.rand(1, 3, 64, 96)
+    with torch.no_grad():
+        y = model(im)[0]
+        monkeypatch.setattr(WaveletBank, "compiling", staticmethod(lambda: True))  # every module runs its own DWT
+        torch.testing.assert_close(model(im)[0], y)